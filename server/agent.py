@@ -1,48 +1,77 @@
 import re
 import json
+import time
+import asyncio
 import random
 import logging
-import aiohttp
-from datetime import datetime
+import httpx
+from collections import OrderedDict
 from typing import Annotated, Optional
+from urllib.parse import quote
 
 from dotenv import load_dotenv
 from livekit.agents import ( AutoSubscribe, JobContext, JobProcess, WorkerOptions, cli, llm, metrics, )
 from livekit.agents.pipeline import AgentCallContext, VoicePipelineAgent
-from livekit.plugins import openai, deepgram, elevenlabs, silero, turn_detector
-from aiohttp import web
-from aiohttp.web import middleware
-from aiohttp.web_request import Request
-from aiohttp.web_response import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 load_dotenv(dotenv_path=".env.local")
 logger = logging.getLogger("voice-assistant")
+_LOC_RE = re.compile(r"[^a-zA-Z0-9]+")
 
 class DocumentAssistant(llm.FunctionContext):
     """Handles document-related operations and utility functions for the voice assistant"""
-    
+
+    __slots__ = ("document_content", "document_name", "_content_response", "_http")
+
+    # Recent wttr.in results keyed by lowercased location, bounded LRU with TTL
+    _WEATHER_CACHE: OrderedDict[str, tuple[float, str]] = OrderedDict()
+    _WEATHER_TTL = 300.0
+    _WEATHER_CACHE_SIZE = 128
+
+
     def __init__(self):
         super().__init__()
         self.document_content = None
         self.document_name = None
+        self._content_response: Optional[str] = None
+        self._http: Optional[httpx.AsyncClient] = None
 
     def load_document_from_metadata(self, metadata: str) -> None:
         """Attempts to parse and load document data from participant metadata"""
         try:
-            parsed_data = json.loads(metadata)
+            if orjson is not None:
+                # orjson wants bytes; encoding here is cheaper than its str path
+                parsed_data = orjson.loads(
+                    metadata if isinstance(metadata, (bytes, bytearray)) else metadata.encode()
+                )
+            else:
+                parsed_data = json.loads(metadata)
             if uploaded_file := parsed_data.get('uploadedFile'):
                 self.document_content = uploaded_file['content']
                 self.document_name = uploaded_file['filename']
-                logger.info(f"Successfully loaded document: '{self.document_name}'")
+                # Build the tool response once; the LLM may request it several times
+                self._content_response = (
+                    f"Contents of '{self.document_name}':\n{self.document_content}"
+                )
+                logger.info("Successfully loaded document: '%s'", self.document_name)
         except Exception as e:
-            logger.error(f"Failed to load document from metadata: {e}")
+            logger.error("Failed to load document from metadata: %s", e)
 
     @llm.ai_callable()
     def get_document_content(self) -> str:
         """Retrieves the content of the uploaded document"""
-        if not self.document_content:
-            return "No document has been uploaded at this time."
-        return f"Contents of '{self.document_name}':\n{self.document_content}"
+        return self._content_response or "No document has been uploaded at this time."
+
+    @llm.ai_callable()
+    def get_current_time(self) -> str:
+        """Returns the current local time"""
+        # time.localtime + f-string is cheaper than datetime.now().strftime
+        t = time.localtime()
+        return f"{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
 
 
     @llm.ai_callable()
@@ -53,45 +82,70 @@ class DocumentAssistant(llm.FunctionContext):
         ],
     ):
         """Retrieves current weather information for the specified location"""
-        sanitized_location = re.sub(r"[^a-zA-Z0-9]+", " ", location).strip()
+        sanitized_location = _LOC_RE.sub(" ", location).strip()
+
+        # Serve repeated queries for the same city from the in-process cache
+        cache_key = sanitized_location.lower()
+        if cached := self._WEATHER_CACHE.get(cache_key):
+            ts, weather_info = cached
+            if time.monotonic() - ts < self._WEATHER_TTL:
+                self._WEATHER_CACHE.move_to_end(cache_key)
+                return f"The weather in {sanitized_location} is {weather_info}."
+
+        # Bind the agent and its message list to locals once; the contextvar
+        # lookup and attribute chain are not worth repeating on the hot path
         current_agent = AgentCallContext.get_current().agent
+        msgs = current_agent.chat_ctx.messages
 
-        # Send acknowledgment message if needed
-        if (not current_agent.chat_ctx.messages or 
-            current_agent.chat_ctx.messages[-1].role != "assistant"):
+        # Send acknowledgment message if needed; run it concurrently with the
+        # HTTP request so the round-trip hides under the TTS playback
+        say_task = None
+        if not msgs or msgs[-1].role != "assistant":
             status_msg = f"Checking weather conditions in {sanitized_location}..."
-            logger.info(f"Sending status message: {status_msg}")
-            await current_agent.say(status_msg, add_to_chat_ctx=True)
-
-        # Fetch weather data
-        logger.info(f"Requesting weather data for: {sanitized_location}")
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"https://wttr.in/{sanitized_location}?format=%C+%t"
-            ) as response:
-                if response.status == 200:
-                    weather_info = await response.text()
-                    result = f"The weather in {sanitized_location} is {weather_info}."
-                    logger.info(f"Weather data received: {result}")
-                    return result
-                else:
-                    raise RuntimeError(f"Weather API request failed: {response.status}")
+            logger.info("Sending status message: %s", status_msg)
+            say_task = asyncio.create_task(
+                current_agent.say(status_msg, add_to_chat_ctx=True)
+            )
+
+        # Fetch weather data over the shared keep-alive session
+        logger.info("Requesting weather data for: %s", sanitized_location)
+        try:
+            response = await self._http.get(
+                f"https://wttr.in/{quote(sanitized_location)}?format=%C+%t",
+                headers={"Accept-Encoding": "identity"},
+            )
+            if response.status_code == 200:
+                # Short ASCII payload; skip charset detection
+                weather_info = response.content.decode("ascii", "replace").strip()
+                self._WEATHER_CACHE[cache_key] = (time.monotonic(), weather_info)
+                self._WEATHER_CACHE.move_to_end(cache_key)
+                if len(self._WEATHER_CACHE) > self._WEATHER_CACHE_SIZE:
+                    self._WEATHER_CACHE.popitem(last=False)
+                result = f"The weather in {sanitized_location} is {weather_info}."
+                logger.info("Weather data received: %s", result)
+                return result
+            else:
+                raise RuntimeError(f"Weather API request failed: {response.status_code}")
+        finally:
+            if say_task is not None:
+                await say_task
 
 
 # Voice Assistant Setup
 # ===============================
 
+_VAD_SINGLETON = None
+
 def prewarm(proc: JobProcess):
     """Initializes voice activity detection model"""
-    proc.userdata["vad"] = silero.VAD.load()
+    # Imported here so the torch/onnx stack loads in the worker, not at module import
+    from livekit.plugins import silero
 
-@middleware
-async def cors_middleware(request: Request, handler):
-    response: Response = await handler(request)
-    response.headers['Access-Control-Allow-Origin'] = 'https://talkwdocs.vercel.app'
-    response.headers['Access-Control-Allow-Methods'] = 'POST, GET, OPTIONS'
-    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-    return response
+    # Load the model once per process; later JobProcess instances reuse it
+    global _VAD_SINGLETON
+    if _VAD_SINGLETON is None:
+        _VAD_SINGLETON = silero.VAD.load()
+    proc.userdata["vad"] = _VAD_SINGLETON
 
 async def entrypoint(ctx: JobContext):
     """Main entry point for the voice assistant application"""
@@ -107,21 +161,35 @@ async def entrypoint(ctx: JobContext):
     )
 
     # Room connection setup
-    logger.info(f"Establishing connection to room: {ctx.room.name}")
+    logger.info("Establishing connection to room: %s", ctx.room.name)
     await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
 
     # Wait for participant and initialize
     participant = await ctx.wait_for_participant()
-    logger.info(f"Initializing assistant for user: {participant.identity}")
-    logger.info(f"User name: {participant.name}")
-    logger.info(f"User metadata: {participant.metadata}")
+    logger.info("Initializing assistant for user: %s", participant.identity)
+    logger.info("User name: %s", participant.name)
+    logger.debug("User metadata: %.200s", participant.metadata)
 
     # Setup document handling
     doc_handler = DocumentAssistant()
+    doc_handler._http = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=20),
+        timeout=10.0,
+    )
+    ctx.add_shutdown_callback(doc_handler._http.aclose)
+
+    # Parse metadata off the loop so it overlaps with plugin initialization below
+    load_task = None
     if participant.metadata:
-        doc_handler.load_document_from_metadata(participant.metadata)
+        load_task = asyncio.create_task(
+            asyncio.to_thread(doc_handler.load_document_from_metadata, participant.metadata)
+        )
+
+    # Initialize voice assistant (plugin imports deferred to keep module import light;
+    # sys.modules caches them so repeated jobs in a process don't re-import)
+    from livekit.plugins import openai, deepgram, elevenlabs, turn_detector
 
-    # Initialize voice assistant
     assistant = VoicePipelineAgent(
         vad=ctx.proc.userdata["vad"],
         stt=deepgram.STT(),
@@ -134,17 +202,30 @@ async def entrypoint(ctx: JobContext):
         fnc_ctx=doc_handler,
     )
 
-    # Setup metrics collection
+    # Setup metrics collection; logging happens in a background task so the
+    # pipeline callback never blocks on formatting or stdout flushes
     metrics_collector = metrics.UsageCollector()
+    metrics_q: asyncio.Queue = asyncio.Queue(maxsize=256)
+
+    async def drain_metrics():
+        while True:
+            assistant_metrics = await metrics_q.get()
+            metrics.log_metrics(assistant_metrics)
+
+    drain_task = asyncio.create_task(drain_metrics())
 
     @assistant.on("metrics_collected")
     def handle_metrics(assistant_metrics: metrics.AgentMetrics):
-        metrics.log_metrics(assistant_metrics)
         metrics_collector.collect(assistant_metrics)
+        try:
+            metrics_q.put_nowait(assistant_metrics)
+        except asyncio.QueueFull:
+            pass  # drop the log entry rather than stall the pipeline
 
     async def log_final_usage():
+        drain_task.cancel()
         usage_summary = metrics_collector.get_summary()
-        logger.info(f"Final Usage Summary: {usage_summary}")
+        logger.info("Final Usage Summary: %s", usage_summary)
 
     ctx.add_shutdown_callback(log_final_usage)
 
@@ -152,6 +233,8 @@ async def entrypoint(ctx: JobContext):
     assistant.start(ctx.room, participant)
 
     # Send welcome message
+    if load_task is not None:
+        await load_task
     welcome_msg = (
         f"Hello! I see you've uploaded '{doc_handler.document_name}'. Let's discuss it!"
         if doc_handler.document_name
@@ -159,10 +242,14 @@ async def entrypoint(ctx: JobContext):
     )
     await assistant.say(welcome_msg, allow_interruptions=True)
 
-    app = web.Application(middlewares=[cors_middleware])
-
 
 if __name__ == "__main__":
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass  # uvloop is unavailable on Windows; stock asyncio works fine
+
     cli.run_app(
         WorkerOptions(
             entrypoint_fnc=entrypoint,